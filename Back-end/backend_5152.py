@@ -1,8 +1,17 @@
 #!/usr/bin/env python3
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import csv
+import io
 import json
-from datetime import datetime
+import math
+import re
+import zlib
+import time
+import bisect
+import hashlib
+import threading
+from datetime import datetime, timedelta
 
 app = Flask(__name__)
 
@@ -21,6 +30,30 @@ SAVE_PATH_VALIDATION_LOGS_FO_MS = "/works/d_dilusha/app_assets_lib/AWS-Asset-Lib
 SAVE_PATH_VALIDATION_LOGS_DR = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_validation_logs_dr"
 SAVE_PATH_VALIDATION_LOGS_DR_FO = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_validation_logs_dr_fo"
 SAVE_PATH_VALIDATION_LOGS_DR_FO_MS = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_validation_logs_dr_fo_ms"
+SAVE_PATH_DRIFT = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_drift"
+SAVE_PATH_COST_HISTORY = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_cost_history"
+SAVE_PATH_COST_ANOMALIES = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_cost_anomalies"
+SAVE_PATH_LOG_SEGMENTS = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_validation_segments"
+
+# Validation log retention (days are counted back from the newest logged day)
+LOG_VIEW_DAYS = 14            # days rendered into the JSON read by the Backup Logs page
+LOG_COMPACT_AFTER_DAYS = 30   # older daily segments are folded into monthly archives
+LOG_RETENTION_DAYS = 180      # older days are expired
+LOG_FUTURE_ALLOWANCE_DAYS = 1 # headers dated further ahead than this are treated as plain lines
+
+# Cost anomaly detection: trailing window of daily costs per (region, service)
+COST_ANOMALY_WINDOW = 14          # days in the rolling baseline
+COST_ANOMALY_MIN_POINTS = 7       # minimum history before a day can be flagged
+COST_ANOMALY_MAD_THRESHOLD = 3.5  # robust z-score (median/MAD) limit
+COST_ANOMALY_MIN_PCT = 0.2        # ignore deviations below 20% of the baseline median
+COST_ANOMALY_MIN_USD = 10.0       # ignore deviations below this absolute amount
+
+# Fields used to key asset records for drift tracking (first non-empty wins).
+# EC2 volumes are tracked as their own "Volume" records keyed by VolumeId.
+DRIFT_KEY_FIELDS = {
+    "EC2": ("InstanceId",),
+    "S3": ("BucketName", "Name"),
+}
 
 # Map sender IP → file name
 ASSETS_FILE_MAP = {
@@ -121,6 +154,71 @@ VALIDATION_LOGS_DR_FO_MS_FILE_MAP = {
     "10.46.10.4": "hk_validations_dr.json"
 }
 
+# Map JSON type → (save path, sender IP file map)
+UPLOAD_TARGETS = {
+    "assets": (SAVE_PATH_ASSETS, ASSETS_FILE_MAP),
+    "cost": (SAVE_PATH_COST, COST_FILE_MAP),
+    "monthly_cost": (SAVE_PATH_COST_MON, COST_MONTHLY_FILE_MAP),
+    "os_edb_versions": (SAVE_PATH_OS_EDB, EDB_OS_FILE_MAP),
+    "os_edb_versions_fo": (SAVE_PATH_OS_EDB_FO, EDB_OS_FO_FILE_MAP),
+    "os_edb_versions_fo_ms": (SAVE_PATH_OS_EDB_FO_MS, EDB_OS_FO_MS_FILE_MAP),
+    "validation_logs": (SAVE_PATH_VALIDATION_LOGS, VALIDATION_LOGS_FILE_MAP),
+    "validation_logs_fo": (SAVE_PATH_VALIDATION_LOGS_FO, VALIDATION_LOGS_FO_FILE_MAP),
+    "validation_logs_fo_ms": (SAVE_PATH_VALIDATION_LOGS_FO_MS, VALIDATION_LOGS_FO_MS_FILE_MAP),
+    "validation_logs_dr": (SAVE_PATH_VALIDATION_LOGS_DR, VALIDATION_LOGS_DR_FILE_MAP),
+    "validation_logs_dr_fo": (SAVE_PATH_VALIDATION_LOGS_DR_FO, VALIDATION_LOGS_DR_FO_FILE_MAP),
+    "validation_logs_dr_fo_ms": (SAVE_PATH_VALIDATION_LOGS_DR_FO_MS, VALIDATION_LOGS_DR_FO_MS_FILE_MAP),
+}
+
+# Backup stores maintained by the backup APIs (ports 5153 / 5154)
+SAVE_PATH_BACKUP = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_backup"
+BACKUP_FILES = {
+    "os_edb_backup": "edb_os_versions_backup.json",
+    "assets_inventory_backup": "assets_inventory.json",
+}
+
+# JSON types included in the search index
+SEARCH_TYPES = [
+    "assets",
+    "os_edb_versions",
+    "os_edb_versions_fo",
+    "os_edb_versions_fo_ms",
+    "validation_logs",
+    "validation_logs_fo",
+    "validation_logs_fo_ms",
+    "validation_logs_dr",
+    "validation_logs_dr_fo",
+    "validation_logs_dr_fo_ms",
+]
+SEARCH_BACKUP_POLL_SECONDS = 5
+SEARCH_DEFAULT_LIMIT = 50
+
+# Fleet export: row sources joined by IP, and the backup fields they pick up
+EXPORT_TYPES = [
+    "assets",
+    "os_edb_versions",
+    "os_edb_versions_fo",
+    "os_edb_versions_fo_ms",
+    "os_edb_backup",
+    "assets_inventory_backup",
+]
+EXPORT_BACKUP_FIELDS = {
+    "os_edb_backup": [
+        "release_date", "last_applied_date", "next_update", "skip",
+        "reason_for_skip", "upgrade_history", "upgrade_notes",
+    ],
+    "assets_inventory_backup": [
+        "asset_custodian", "asset_owner", "risk_owner",
+        "asset_classification", "data_classification",
+    ],
+}
+EXPORT_ASSET_FIELDS = [
+    "resource", "id", "name", "aws_region", "availability_zone",
+    "instance_type", "state", "launch_time", "volume_count", "volume_gib",
+]
+EXPORT_OS_EDB_FIELDS = ["port", "edb_version", "os_version"]
+EXPORT_CHUNK_ROWS = 500
+
 # ---------------------------------------
 # Helper: Save JSON to file
 # ---------------------------------------
@@ -135,6 +233,767 @@ def save_json_file(save_path, file_name, data):
         print(f"[{datetime.now()}] Failed to save JSON ({file_name}): {e}")
 
 
+# ---------------------------------------
+# Inventory drift tracking
+# ---------------------------------------
+# Last known snapshot per assets file: {(resource, id): (hash, record)}
+drift_snapshots = {}
+drift_lock = threading.Lock()
+
+
+def record_hash(record):
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def flatten_assets(data):
+    """Flatten an assets payload into {(resource, id): record}."""
+    records = {}
+    if not isinstance(data, dict):
+        return records
+    resources = data.get("Resources") or {}
+    for resource_type, items in resources.items():
+        key_fields = DRIFT_KEY_FIELDS.get(resource_type, ("Id", "Name"))
+        for item in items or []:
+            if not isinstance(item, dict):
+                continue
+            key = next((item[f] for f in key_fields if item.get(f)), None)
+            if key is None:
+                continue
+            key = str(key)
+            record = item
+            if resource_type == "EC2":
+                volumes = [v for v in item.get("Volumes") or [] if isinstance(v, dict)]
+                record = {k: v for k, v in item.items() if k != "Volumes"}
+                record["Volumes"] = sorted(str(v["VolumeId"]) for v in volumes if v.get("VolumeId"))
+                for volume in volumes:
+                    if volume.get("VolumeId"):
+                        volume_record = dict(volume)
+                        volume_record["InstanceId"] = key
+                        records[("Volume", str(volume["VolumeId"]))] = volume_record
+            records[(resource_type, key)] = record
+    return records
+
+
+def load_drift_snapshot(save_path, file_name):
+    """Return the cached snapshot for a file, seeding it from disk on first use."""
+    if file_name in drift_snapshots:
+        return drift_snapshots[file_name]
+    file_path = os.path.join(save_path, file_name)
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        data = {}
+    snapshot = {key: (record_hash(r), r) for key, r in flatten_assets(data).items()}
+    drift_snapshots[file_name] = snapshot
+    return snapshot
+
+
+def diff_assets(old_snapshot, new_records):
+    """Compare new records against a snapshot; only hash mismatches are diffed field by field."""
+    changes = []
+    new_snapshot = {}
+    for key, record in new_records.items():
+        digest = record_hash(record)
+        new_snapshot[key] = (digest, record)
+        previous = old_snapshot.get(key)
+        if previous is None:
+            change = {"resource": key[0], "id": key[1], "action": "added"}
+            if record.get("Name"):
+                change["name"] = record["Name"]
+            changes.append(change)
+        elif previous[0] != digest:
+            old_record = previous[1]
+            fields = {}
+            for field in sorted(set(old_record) | set(record)):
+                if old_record.get(field) != record.get(field):
+                    fields[field] = {"old": old_record.get(field), "new": record.get(field)}
+            changes.append({"resource": key[0], "id": key[1], "action": "changed", "fields": fields})
+    for key, (_, old_record) in old_snapshot.items():
+        if key not in new_snapshot:
+            change = {"resource": key[0], "id": key[1], "action": "removed"}
+            if old_record.get("Name"):
+                change["name"] = old_record["Name"]
+            changes.append(change)
+    return changes, new_snapshot
+
+
+def record_drift(save_path, file_name, data):
+    """Diff an assets upload against the previous one and append the change log."""
+    region = file_name.split("_")[0]
+    with drift_lock:
+        old_snapshot = load_drift_snapshot(save_path, file_name)
+        changes, new_snapshot = diff_assets(old_snapshot, flatten_assets(data))
+        drift_snapshots[file_name] = new_snapshot
+        if not old_snapshot:
+            print(f"[{datetime.now()}] Drift baseline recorded for {region} ({len(new_snapshot)} records)")
+            return
+        if not changes:
+            print(f"[{datetime.now()}] No inventory drift for {region}")
+            return
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "region": region,
+            "source_timestamp": data.get("Timestamp", ""),
+            "summary": {
+                action: sum(1 for c in changes if c["action"] == action)
+                for action in ("added", "removed", "changed")
+            },
+            "changes": changes,
+        }
+        os.makedirs(SAVE_PATH_DRIFT, exist_ok=True)
+        drift_path = os.path.join(SAVE_PATH_DRIFT, f"{region}_drift.jsonl")
+        try:
+            with open(drift_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, separators=(",", ":"), default=str) + "\n")
+            print(f"[{datetime.now()}] Recorded {len(changes)} drift change(s) for {region}")
+        except Exception as e:
+            print(f"[{datetime.now()}] Failed to write drift log ({drift_path}): {e}")
+
+
+# ---------------------------------------
+# Cost anomaly detection
+# ---------------------------------------
+def merge_cost_history(region, data):
+    """Merge a monthly_cost upload into the region's daily history {service: {date: cost}}."""
+    history_path = os.path.join(SAVE_PATH_COST_HISTORY, f"{region}_daily_costs.json")
+    try:
+        with open(history_path, "r", encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        history = {}
+    if not isinstance(history, dict):
+        history = {}
+    # Malformed services and days are skipped individually so one bad entry doesn't drop the region
+    for service in data.get("services") or []:
+        if not isinstance(service, dict) or not service.get("service"):
+            continue
+        series = history.setdefault(str(service["service"]), {})
+        for day in service.get("daily_costs") or []:
+            if not isinstance(day, dict) or not isinstance(day.get("date"), str):
+                continue
+            try:
+                cost = float(day.get("cost_usd"))
+            except (TypeError, ValueError):
+                continue
+            if math.isfinite(cost):
+                series[day["date"]] = cost
+    save_json_file(SAVE_PATH_COST_HISTORY, f"{region}_daily_costs.json", history)
+    return history
+
+
+def detect_cost_anomalies(series):
+    """Flag days deviating from the trailing median/MAD baseline.
+
+    The window is kept sorted and updated incrementally, so each day costs
+    O(window) instead of re-sorting the whole history.
+    """
+    dates = sorted(series)
+    window = []   # trailing values in arrival order
+    ordered = []  # same values, sorted
+    total = 0.0
+    anomalies = []
+    for date in dates:
+        cost = series[date]
+        if len(window) >= COST_ANOMALY_MIN_POINTS:
+            n = len(ordered)
+            median = (ordered[n // 2] + ordered[(n - 1) // 2]) / 2
+            deviations = sorted(abs(v - median) for v in ordered)
+            mad = (deviations[n // 2] + deviations[(n - 1) // 2]) / 2
+            delta = cost - median
+            score = delta / (1.4826 * mad) if mad else None
+            significant = abs(delta) >= COST_ANOMALY_MIN_USD and abs(delta) >= COST_ANOMALY_MIN_PCT * abs(median)
+            if significant and (score is None or abs(score) > COST_ANOMALY_MAD_THRESHOLD):
+                anomalies.append({
+                    "date": date,
+                    "cost_usd": round(cost, 4),
+                    "baseline_median": round(median, 4),
+                    "baseline_mean": round(total / n, 4),
+                    "mad": round(mad, 4),
+                    "deviation_usd": round(delta, 4),
+                    "score": round(score, 2) if score is not None else None,
+                    "direction": "spike" if delta > 0 else "drop",
+                })
+        window.append(cost)
+        bisect.insort(ordered, cost)
+        total += cost
+        if len(window) > COST_ANOMALY_WINDOW:
+            old = window.pop(0)
+            ordered.pop(bisect.bisect_left(ordered, old))
+            total -= old
+    return anomalies
+
+
+def record_cost_anomalies(file_name, data):
+    """Update the region's cost history and rewrite its anomaly feed."""
+    region = file_name.split("_")[0]
+    started = time.time()
+    try:
+        history = merge_cost_history(region, data)
+        feed = []
+        for service, series in history.items():
+            for anomaly in detect_cost_anomalies(series):
+                feed.append(dict(anomaly, region=region, service=service))
+        feed.sort(key=lambda a: (a["date"], a["service"]), reverse=True)
+        save_json_file(SAVE_PATH_COST_ANOMALIES, f"{region}_anomalies.json", {
+            "type": "cost_anomalies",
+            "region": region,
+            "account_name": data.get("account_name", ""),
+            "generated": datetime.now().isoformat(),
+            "anomalies": feed,
+        })
+        print(f"[{datetime.now()}] Cost anomalies for {region}: {len(feed)} flagged "
+              f"in {time.time() - started:.3f}s")
+    except Exception as e:
+        print(f"[{datetime.now()}] Cost anomaly detection failed for {region}: {e}")
+
+
+# ---------------------------------------
+# Search index
+# ---------------------------------------
+# token -> {doc_id: term count}; sorted token list is kept for prefix lookups
+search_postings = {}
+search_tokens = []
+search_docs = {}      # doc_id -> result payload
+search_doc_terms = {} # doc_id -> {token: count}
+search_sources = {}   # (json_type, file_name) -> [doc_id, ...]
+search_backup_mtimes = {}
+search_lock = threading.RLock()
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._:/-][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Split text into lowercase tokens; hyphen/underscore compounds also yield their parts."""
+    tokens = []
+    for token in TOKEN_RE.findall(str(text).lower()):
+        tokens.append(token)
+        parts = re.split(r"[-_/:]", token)
+        if len(parts) > 1:
+            tokens.extend(p for p in parts if p)
+            # Trailing segments ("oms-db-2" of "...-bo-oms-db-2") so name fragments
+            # get an exact or prefix hit instead of the unordered parts fallback
+            separators = list(re.finditer(r"[-_/:]", token))
+            tokens.extend(token[m.end():] for m in separators[:-1])
+    return tokens
+
+
+def flatten_values(value):
+    if isinstance(value, dict):
+        # AWS style tag lists / dicts contribute both keys and values
+        for k, v in value.items():
+            yield k
+            yield from flatten_values(v)
+    elif isinstance(value, list):
+        for v in value:
+            yield from flatten_values(v)
+    elif value is not None:
+        yield value
+
+
+def build_search_docs(json_type, file_name, data):
+    """Turn a stored payload into [(doc_id, payload, text)] for indexing."""
+    region = "" if json_type in BACKUP_FILES else file_name.split("_")[0]
+    docs = []
+    if not isinstance(data, dict):
+        return docs
+    if json_type == "assets":
+        for resource_type, items in (data.get("Resources") or {}).items():
+            for item in items or []:
+                if not isinstance(item, dict):
+                    continue
+                key = item.get("InstanceId") or item.get("BucketName") or item.get("Name")
+                if not key:
+                    continue
+                fields = [item.get(f) for f in ("InstanceId", "Name", "PrivateIP", "PublicIP",
+                                                "InstanceType", "State", "AvailabilityZone", "Region")]
+                fields.extend(v.get("VolumeId") for v in item.get("Volumes") or [] if isinstance(v, dict))
+                fields.extend(flatten_values(item.get("Tags")))
+                payload = {
+                    "type": json_type, "region": region, "resource": resource_type,
+                    "id": key, "name": item.get("Name", ""), "ip": item.get("PrivateIP", ""),
+                }
+                docs.append((f"{json_type}:{file_name}:{key}", payload, " ".join(str(f) for f in fields if f)))
+    elif json_type.startswith("os_edb_versions") or json_type in BACKUP_FILES:
+        for server in data.get("servers") or []:
+            if not isinstance(server, dict) or not server.get("ip"):
+                continue
+            ip = str(server["ip"]).strip()
+            payload = {"type": json_type, "region": region, "ip": ip, "name": server.get("ec2_name", "")}
+            if json_type.startswith("os_edb_versions"):
+                payload["edb_version"] = server.get("edb_version", "")
+                payload["os_version"] = server.get("os_version", "")
+            docs.append((f"{json_type}:{file_name}:{ip}", payload, " ".join(str(v) for v in flatten_values(server))))
+    elif json_type.startswith("validation_logs"):
+        for i, line in enumerate(data.get("data") or []):
+            if not isinstance(line, str) or not line.strip():
+                continue
+            payload = {"type": json_type, "region": region, "line_no": i + 1, "line": line}
+            docs.append((f"{json_type}:{file_name}:{i}", payload, line))
+    return docs
+
+
+def remove_search_doc(doc_id):
+    for token in search_doc_terms.pop(doc_id, {}):
+        postings = search_postings.get(token)
+        if postings is None:
+            continue
+        postings.pop(doc_id, None)
+        if not postings:
+            del search_postings[token]
+            i = bisect.bisect_left(search_tokens, token)
+            if i < len(search_tokens) and search_tokens[i] == token:
+                search_tokens.pop(i)
+    search_docs.pop(doc_id, None)
+
+
+def index_source(json_type, file_name, data):
+    """Replace all indexed documents for one stored file."""
+    with search_lock:
+        for doc_id in search_sources.pop((json_type, file_name), []):
+            remove_search_doc(doc_id)
+        doc_ids = []
+        for doc_id, payload, text in build_search_docs(json_type, file_name, data):
+            terms = {}
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + 1
+            if doc_id in search_docs:
+                remove_search_doc(doc_id)
+            for token, count in terms.items():
+                postings = search_postings.get(token)
+                if postings is None:
+                    postings = search_postings[token] = {}
+                    bisect.insort(search_tokens, token)
+                postings[doc_id] = count
+            search_docs[doc_id] = payload
+            search_doc_terms[doc_id] = terms
+            doc_ids.append(doc_id)
+        search_sources[(json_type, file_name)] = doc_ids
+    return len(doc_ids)
+
+
+def match_search_token(q, total_docs):
+    """Score documents whose tokens equal or start with q."""
+    token_scores = {}
+    i = bisect.bisect_left(search_tokens, q)
+    while i < len(search_tokens) and search_tokens[i].startswith(q):
+        token = search_tokens[i]
+        postings = search_postings[token]
+        # Exact hits outrank prefix hits; rare tokens outrank common ones
+        weight = (2.0 if token == q else 1.0) * (1.0 + total_docs / len(postings)) ** 0.5
+        for doc_id, count in postings.items():
+            score = weight * (1.0 + count) ** 0.5
+            if score > token_scores.get(doc_id, 0.0):
+                token_scores[doc_id] = score
+        i += 1
+    return token_scores
+
+
+def and_scores(scores, token_scores):
+    if scores is None:
+        return token_scores
+    return {d: scores[d] + sc for d, sc in token_scores.items() if d in scores}
+
+
+def search_index(query, limit=SEARCH_DEFAULT_LIMIT, json_type=None):
+    """Rank documents matching every query token (exact or prefix)."""
+    query_tokens = list(dict.fromkeys(TOKEN_RE.findall(query.lower())))
+    if not query_tokens:
+        return []
+    with search_lock:
+        total_docs = max(len(search_docs), 1)
+        scores = None
+        for q in query_tokens:
+            token_scores = match_search_token(q, total_docs)
+            parts = [p for p in re.split(r"[-_/:]", q) if p]
+            if not token_scores and len(parts) > 1:
+                # Compound fragments (e.g. "oms-db") are indexed as their parts, as in tokenize()
+                for part in parts:
+                    token_scores = and_scores(token_scores or None, match_search_token(part, total_docs))
+                    if not token_scores:
+                        break
+            scores = and_scores(scores, token_scores)
+            if not scores:
+                return []
+        if json_type:
+            scores = {d: sc for d, sc in scores.items() if search_docs[d]["type"] == json_type}
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        return [dict(search_docs[d], score=round(sc, 3)) for d, sc in ranked]
+
+
+def read_json_quietly(file_path):
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def refresh_backup_index():
+    """Re-index backup stores whose file changed since the last check."""
+    for json_type, file_name in BACKUP_FILES.items():
+        file_path = os.path.join(SAVE_PATH_BACKUP, file_name)
+        try:
+            mtime = os.path.getmtime(file_path)
+        except OSError:
+            continue
+        if search_backup_mtimes.get(file_path) == mtime:
+            continue
+        search_backup_mtimes[file_path] = mtime
+        data = read_json_quietly(file_path)
+        if data is not None:
+            count = index_source(json_type, file_name, data)
+            print(f"[{datetime.now()}] Indexed {count} backup entries from {file_name}")
+
+
+def build_search_index():
+    """Index everything currently on disk; later updates are incremental."""
+    started = time.time()
+    for json_type in SEARCH_TYPES:
+        save_path, file_map = UPLOAD_TARGETS[json_type]
+        for file_name in sorted(set(file_map.values())):
+            data = read_json_quietly(os.path.join(save_path, file_name))
+            if data is not None:
+                index_source(json_type, file_name, data)
+    refresh_backup_index()
+    print(f"[{datetime.now()}] Search index built: {len(search_docs)} documents, "
+          f"{len(search_tokens)} tokens in {time.time() - started:.2f}s")
+
+
+def watch_backup_files():
+    # Backup POSTs are handled by separate services, so pick up their writes by mtime
+    while True:
+        time.sleep(SEARCH_BACKUP_POLL_SECONDS)
+        try:
+            refresh_backup_index()
+        except Exception as e:
+            print(f"[{datetime.now()}] Backup index refresh failed: {e}")
+
+
+# ---------------------------------------
+# Validation log segments
+# ---------------------------------------
+# A new day starts at "... LOGS FOR <date> ..." or "Catcheck for <scope> on <date> ..." lines
+LOG_DAY_HEADER_RE = re.compile(r"(?:LOGS FOR|^Catcheck for \S+ on) (\d{4}-\d{2}-\d{2})")
+
+# Per-log manifest {date: {"segment": file, "hash": digest}} and last rendered view
+log_manifests = {}
+log_views = {}
+log_segment_lock = threading.Lock()
+
+
+def parse_log_date(date):
+    """Return the header date, or None if it is impossible or too far in the future."""
+    try:
+        parsed = datetime.strptime(date, "%Y-%m-%d")
+    except ValueError:
+        return None
+    if parsed > datetime.now() + timedelta(days=LOG_FUTURE_ALLOWANCE_DAYS):
+        return None
+    return parsed
+
+
+def split_log_days(lines):
+    """Group log lines by day; lines before the first header belong to the first day."""
+    days = {}
+    preamble = []
+    current = None
+    for line in lines:
+        line = line if isinstance(line, str) else str(line)
+        match = LOG_DAY_HEADER_RE.search(line)
+        if match and not parse_log_date(match.group(1)):
+            match = None  # Impossible or future date: keep the line in the current day
+        if match:
+            current = days.setdefault(match.group(1), [])
+            if preamble:
+                current.extend(preamble)
+                preamble = []
+        if current is None:
+            preamble.append(line)
+        else:
+            current.append(line)
+    return days
+
+
+def shift_date(date, days):
+    return (datetime.strptime(date, "%Y-%m-%d") - timedelta(days=days)).strftime("%Y-%m-%d")
+
+
+def read_log_segment(segment_dir, entry, date):
+    segment = read_json_quietly(os.path.join(segment_dir, entry["segment"])) or {}
+    return segment.get(date, [])
+
+
+def write_log_segment(segment_dir, segment_name, content):
+    """Atomically replace a segment (or the manifest) file."""
+    file_path = os.path.join(segment_dir, segment_name)
+    with open(f"{file_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(content, f, separators=(",", ":"), ensure_ascii=False)
+    os.replace(f"{file_path}.tmp", file_path)
+
+
+def store_validation_logs(save_path, file_name, data):
+    """Store new days as segments and re-render the recent-days view.
+
+    Returns the rendered view, or None if the payload has no day headers or
+    the segments could not be stored (the caller then saves the whole file).
+    """
+    lines = data.get("data")
+    days = split_log_days(lines) if isinstance(lines, list) else {}
+    if not days:
+        return None
+
+    segment_dir = os.path.join(SAVE_PATH_LOG_SEGMENTS, os.path.basename(save_path), os.path.splitext(file_name)[0])
+    with log_segment_lock:
+        try:
+            return update_log_segments(segment_dir, save_path, file_name, data, days)
+        except Exception as e:
+            # Forget cached state; the manifest on disk still describes the stored segments
+            log_manifests.pop(segment_dir, None)
+            log_views.pop(segment_dir, None)
+            print(f"[{datetime.now()}] Failed to store validation log segments ({file_name}): {e}")
+            return None
+
+
+def update_log_segments(segment_dir, save_path, file_name, data, days):
+    os.makedirs(segment_dir, exist_ok=True)
+    cached = log_manifests.get(segment_dir)
+    if cached is None:
+        cached = read_json_quietly(os.path.join(segment_dir, "manifest.json")) or {}
+    manifest = {date: dict(entry) for date, entry in cached.items()}
+
+    # Retention counts back from the newest logged day, but never from a day after today
+    now = datetime.now()
+    today = now.strftime("%Y-%m-%d")
+    future_limit = (now + timedelta(days=LOG_FUTURE_ALLOWANCE_DAYS)).strftime("%Y-%m-%d")
+    newest = min(max(max(days), max(manifest, default="")), today)
+    retention_cutoff = shift_date(newest, LOG_RETENTION_DAYS)
+    compact_cutoff = shift_date(newest, LOG_COMPACT_AFTER_DAYS)
+    changed = []
+
+    # Append only: store new days, and replace a stored day only with content that extends it
+    for date, day_lines in days.items():
+        if date < retention_cutoff:
+            continue
+        digest = record_hash(day_lines)
+        entry = manifest.get(date)
+        if entry and entry["hash"] == digest:
+            continue
+        if entry:
+            stored = read_log_segment(segment_dir, entry, date)
+            if len(day_lines) <= len(stored) or day_lines[:len(stored)] != stored:
+                continue
+        segment_name = entry["segment"] if entry else f"{date}.json"
+        segment = {}
+        if segment_name != f"{date}.json":
+            # Late addition to an already archived day
+            segment = read_json_quietly(os.path.join(segment_dir, segment_name)) or {}
+        segment[date] = day_lines
+        write_log_segment(segment_dir, segment_name, segment)
+        manifest[date] = {"segment": segment_name, "hash": digest}
+        changed.append(date)
+
+    # Fold old daily segments into monthly archives
+    to_compact = {}
+    for date, entry in manifest.items():
+        if retention_cutoff <= date < compact_cutoff and entry["segment"] == f"{date}.json":
+            to_compact.setdefault(date[:7], []).append(date)
+    stale_segments = set()
+    compacted = 0
+    for month, dates in to_compact.items():
+        archive_name = f"{month}.json"
+        archive = read_json_quietly(os.path.join(segment_dir, archive_name)) or {}
+        for date in dates:
+            segment = read_json_quietly(os.path.join(segment_dir, f"{date}.json")) or {}
+            if date in segment:
+                archive[date] = segment[date]
+                manifest[date]["segment"] = archive_name
+                compacted += 1
+            else:
+                print(f"[{datetime.now()}] Validation log segment {date}.json missing for {file_name}; dropped")
+                manifest.pop(date)
+            stale_segments.add(f"{date}.json")
+        write_log_segment(segment_dir, archive_name, archive)
+
+    # Expire days past retention (and bogus future days left by older uploads)
+    expired = [date for date in manifest if date < retention_cutoff or date > future_limit]
+    stale_segments.update(manifest.pop(date)["segment"] for date in expired)
+
+    if not changed and not to_compact and not expired and segment_dir in log_views:
+        return log_views[segment_dir]
+
+    # Commit the manifest before deleting anything it no longer references
+    write_log_segment(segment_dir, "manifest.json", manifest)
+    log_manifests[segment_dir] = manifest
+    live_segments = {entry["segment"] for entry in manifest.values()}
+    for segment_name in stale_segments - live_segments:
+        try:
+            os.remove(os.path.join(segment_dir, segment_name))
+        except OSError:
+            pass
+
+    view_lines = []
+    for date in sorted(manifest)[-LOG_VIEW_DAYS:]:
+        view_lines.extend(read_log_segment(segment_dir, manifest[date], date))
+    view = {key: value for key, value in data.items() if key != "data"}
+    view["data"] = view_lines
+    save_json_file(save_path, file_name, view)
+    log_views[segment_dir] = view
+    print(f"[{datetime.now()}] Validation logs {file_name}: {len(changed)} day(s) written, "
+          f"{compacted} compacted, {len(expired)} expired")
+    return view
+
+
+# ---------------------------------------
+# Fleet export
+# ---------------------------------------
+def export_regions():
+    files = []
+    for json_type in EXPORT_TYPES:
+        if json_type in UPLOAD_TARGETS:
+            files.extend(UPLOAD_TARGETS[json_type][1].values())
+    return sorted({f.split("_")[0] for f in files})
+
+
+def join_export_record(ip, record, os_edb, backups):
+    """Attach OS/EDB versions and backup fields for ip to an export record."""
+    for json_type, servers in os_edb.items():
+        server = servers.get(ip)
+        if server:
+            record[json_type] = {f: server.get(f) for f in EXPORT_OS_EDB_FIELDS}
+    for json_type, entries in backups.items():
+        entry = entries.get(ip)
+        if entry:
+            record[json_type] = {f: entry.get(f, "") for f in EXPORT_BACKUP_FIELDS[json_type]}
+    return record
+
+
+def export_rows(types, regions, include_unmatched=True):
+    """Yield one joined record per asset / server IP, one region at a time.
+
+    With include_unmatched, backup entries whose IP matched no asset or
+    OS/EDB record in any region are emitted last with an empty region.
+    """
+    emitted = set()
+    backups = {}
+    for json_type in types:
+        if json_type in BACKUP_FILES:
+            data = read_json_quietly(os.path.join(SAVE_PATH_BACKUP, BACKUP_FILES[json_type])) or {}
+            backups[json_type] = {
+                str(server["ip"]).strip(): server
+                for server in data.get("servers") or [] if isinstance(server, dict) and server.get("ip")
+            }
+    os_edb_types = [t for t in types if t.startswith("os_edb_versions")]
+
+    for region in regions:
+        os_edb = {}
+        for json_type in os_edb_types:
+            save_path, file_map = UPLOAD_TARGETS[json_type]
+            servers = {}
+            for file_name in sorted({f for f in file_map.values() if f.split("_")[0] == region}):
+                data = read_json_quietly(os.path.join(save_path, file_name)) or {}
+                for server in data.get("servers") or []:
+                    if isinstance(server, dict) and server.get("ip"):
+                        servers[str(server["ip"]).strip()] = server
+            os_edb[json_type] = servers
+
+        seen = set()
+        if "assets" in types:
+            save_path, file_map = UPLOAD_TARGETS["assets"]
+            for file_name in sorted({f for f in file_map.values() if f.split("_")[0] == region}):
+                data = read_json_quietly(os.path.join(save_path, file_name)) or {}
+                for resource_type, items in (data.get("Resources") or {}).items():
+                    for item in items or []:
+                        if not isinstance(item, dict):
+                            continue
+                        ip = str(item.get("PrivateIP") or "").strip()
+                        volumes = [v for v in item.get("Volumes") or [] if isinstance(v, dict)]
+                        record = {
+                            "region": region,
+                            "ip": ip,
+                            "resource": resource_type,
+                            "id": item.get("InstanceId") or item.get("BucketName") or item.get("Name"),
+                            "name": item.get("Name"),
+                            "aws_region": item.get("Region"),
+                            "availability_zone": item.get("AvailabilityZone"),
+                            "instance_type": item.get("InstanceType"),
+                            "state": item.get("State"),
+                            "launch_time": item.get("LaunchTime"),
+                            "volume_count": len(volumes),
+                            "volume_gib": sum(v.get("SizeGiB") or 0 for v in volumes),
+                        }
+                        if ip:
+                            seen.add(ip)
+                        yield join_export_record(ip, record, os_edb, backups)
+
+        # Servers reported by OS/EDB agents that have no matching asset record
+        extra_ips = sorted({ip for servers in os_edb.values() for ip in servers} - seen)
+        for ip in extra_ips:
+            name = next((s[ip].get("ec2_name") for s in os_edb.values() if ip in s), None)
+            yield join_export_record(ip, {"region": region, "ip": ip, "resource": "", "name": name}, os_edb, backups)
+        emitted |= seen
+        emitted.update(extra_ips)
+
+    # Backup-only entries (no region is known for them)
+    if include_unmatched:
+        backup_ips = sorted({ip for entries in backups.values() for ip in entries} - emitted)
+        for ip in backup_ips:
+            yield join_export_record(ip, {"region": "", "ip": ip, "resource": "", "name": None}, {}, backups)
+
+
+def export_csv_columns(types):
+    columns = ["region", "ip"] + EXPORT_ASSET_FIELDS
+    for json_type in types:
+        if json_type.startswith("os_edb_versions"):
+            columns.extend(f"{json_type}.{f}" for f in EXPORT_OS_EDB_FIELDS)
+        elif json_type in EXPORT_BACKUP_FIELDS:
+            columns.extend(f"{json_type}.{f}" for f in EXPORT_BACKUP_FIELDS[json_type])
+    return columns
+
+
+def export_chunks(rows, fmt, types):
+    """Serialize rows in batches; the first row is sent on its own so output starts at once."""
+    columns = export_csv_columns(types) if fmt == "csv" else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if columns else None
+    if writer:
+        writer.writerow(columns)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    pending = 0
+    first = True
+    for row in rows:
+        if writer:
+            flat = {k: v for k, v in row.items() if not isinstance(v, dict)}
+            for json_type, values in row.items():
+                if isinstance(values, dict):
+                    flat.update({f"{json_type}.{k}": v for k, v in values.items()})
+            writer.writerow(["" if flat.get(c) is None else flat.get(c) for c in columns])
+        else:
+            buffer.write(json.dumps(row, separators=(",", ":"), default=str) + "\n")
+        pending += 1
+        if first or pending >= EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+            first = False
+    if pending:
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 # ---------------------------------------
 # POST Endpoint
 # ---------------------------------------
@@ -151,46 +1010,12 @@ def upload_json():
     # Determine JSON type: default to 'assets' if missing
     json_type = data.get("type", "assets").lower()
 
-    if json_type == "assets":
-        file_map = ASSETS_FILE_MAP
-        save_path = SAVE_PATH_ASSETS
-    elif json_type == "cost":
-        file_map = COST_FILE_MAP
-        save_path = SAVE_PATH_COST
-    elif json_type == "monthly_cost":
-        file_map = COST_MONTHLY_FILE_MAP
-        save_path = SAVE_PATH_COST_MON
-    elif json_type == "os_edb_versions":
-        file_map = EDB_OS_FILE_MAP
-        save_path = SAVE_PATH_OS_EDB
-    elif json_type == "os_edb_versions_fo":
-        file_map = EDB_OS_FO_FILE_MAP
-        save_path = SAVE_PATH_OS_EDB_FO
-    elif json_type == "os_edb_versions_fo_ms":
-        file_map = EDB_OS_FO_MS_FILE_MAP
-        save_path = SAVE_PATH_OS_EDB_FO_MS
-    elif json_type == "validation_logs":
-        file_map = VALIDATION_LOGS_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS
-    elif json_type == "validation_logs_fo":
-        file_map = VALIDATION_LOGS_FO_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS_FO
-    elif json_type == "validation_logs_fo_ms":
-        file_map = VALIDATION_LOGS_FO_MS_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS_FO_MS
-    elif json_type == "validation_logs_dr":
-        file_map = VALIDATION_LOGS_DR_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS_DR
-    elif json_type == "validation_logs_dr_fo":
-        file_map = VALIDATION_LOGS_DR_FO_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS_DR_FO
-    elif json_type == "validation_logs_dr_fo_ms":
-        file_map = VALIDATION_LOGS_DR_FO_MS_FILE_MAP
-        save_path = SAVE_PATH_VALIDATION_LOGS_DR_FO_MS
-    else:
+    target = UPLOAD_TARGETS.get(json_type)
+    if target is None:
         msg = f"Unknown JSON type '{json_type}' from {client_ip}"
         print(f"[{datetime.now()}] {msg}")
         return jsonify({"status": "error", "message": msg}), 400
+    save_path, file_map = target
 
     # Get target file name
     file_name = file_map.get(client_ip)
@@ -199,12 +1024,151 @@ def upload_json():
         print(f"[{datetime.now()}] {msg}")
         return jsonify({"status": "error", "message": msg}), 400
 
+    # Record inventory drift against the previous upload before overwriting it
+    if json_type == "assets":
+        record_drift(save_path, file_name, data)
+
+    # Validation logs are kept as per-day segments; the saved file is a recent-days view
+    stored = None
+    if json_type.startswith("validation_logs"):
+        stored = store_validation_logs(save_path, file_name, data)
+
     # Save JSON
-    save_json_file(save_path, file_name, data)
+    if stored is None:
+        save_json_file(save_path, file_name, data)
+        stored = data
+
+    if json_type in SEARCH_TYPES:
+        index_source(json_type, file_name, stored)
+    elif json_type == "monthly_cost":
+        record_cost_anomalies(file_name, data)
 
     return jsonify({"status": "success", "message": f"Data saved for {client_ip}"}), 200
 
 
+# ---------------------------------------
+# GET Endpoint: Streaming fleet export
+# ---------------------------------------
+@app.route("/api/export", methods=["GET"])
+def export_fleet():
+    """Stream joined fleet records: ?format=ndjson|csv&types=a,b&region=us,uk&gzip=1."""
+    fmt = request.args.get("format", "ndjson").strip().lower()
+    if fmt not in ("ndjson", "csv"):
+        return jsonify({"status": "error", "message": f"Unknown export format '{fmt}'"}), 400
+
+    types = EXPORT_TYPES
+    if request.args.get("types"):
+        types = [t.strip().lower() for t in request.args["types"].split(",") if t.strip()]
+        unknown = [t for t in types if t not in EXPORT_TYPES]
+        if unknown:
+            return jsonify({"status": "error", "message": f"Unknown export types: {', '.join(unknown)}"}), 400
+
+    regions = export_regions()
+    region_filtered = bool(request.args.get("region"))
+    if region_filtered:
+        requested = [r.strip().lower() for r in request.args["region"].split(",") if r.strip()]
+        unknown = [r for r in requested if r not in regions]
+        if unknown:
+            return jsonify({"status": "error", "message": f"Unknown regions: {', '.join(unknown)}"}), 400
+        regions = [r for r in regions if r in requested]
+
+    print(f"[{datetime.now()}] Export ({fmt}) for {request.remote_addr}: types={types} regions={regions}")
+    # Backup-only entries can't be placed in a region, so they are left out of region-filtered exports
+    chunks = export_chunks(export_rows(types, regions, include_unmatched=not region_filtered), fmt, types)
+    file_name = f"fleet_export.{fmt}"
+    headers = {"Content-Disposition": f"attachment; filename={file_name}", "X-Accel-Buffering": "no"}
+    if request.args.get("gzip", "").lower() in ("1", "true", "yes"):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+# ---------------------------------------
+# GET Endpoint: Cost anomaly feed
+# ---------------------------------------
+@app.route("/api/cost-anomalies", methods=["GET"])
+def get_cost_anomalies():
+    """Return flagged cost anomalies, optionally filtered by ?region=&service=&since=<date>."""
+    region = request.args.get("region", "").strip().lower()
+    service = request.args.get("service", "").strip()
+    since = request.args.get("since", "").strip()
+
+    anomalies = []
+    if os.path.isdir(SAVE_PATH_COST_ANOMALIES):
+        for name in sorted(os.listdir(SAVE_PATH_COST_ANOMALIES)):
+            if not name.endswith("_anomalies.json"):
+                continue
+            if region and name != f"{region}_anomalies.json":
+                continue
+            feed = read_json_quietly(os.path.join(SAVE_PATH_COST_ANOMALIES, name)) or {}
+            for anomaly in feed.get("anomalies", []):
+                if service and anomaly.get("service") != service:
+                    continue
+                if since and anomaly.get("date", "") <= since:
+                    continue
+                anomalies.append(anomaly)
+
+    anomalies.sort(key=lambda a: (a["date"], a["region"], a["service"]), reverse=True)
+    return jsonify({"status": "success", "anomalies": anomalies}), 200
+
+
+# ---------------------------------------
+# GET Endpoint: Search across assets, OS/EDB versions, logs and backups
+# ---------------------------------------
+@app.route("/api/search", methods=["GET"])
+def search_inventory():
+    """Search the in-memory index: ?q=<text>&type=<json type>&limit=<n>."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"status": "error", "message": "Query parameter 'q' is required"}), 400
+    try:
+        limit = max(1, min(int(request.args.get("limit", SEARCH_DEFAULT_LIMIT)), 500))
+    except ValueError:
+        return jsonify({"status": "error", "message": "Query parameter 'limit' must be an integer"}), 400
+
+    started = time.perf_counter()
+    results = search_index(query, limit=limit, json_type=request.args.get("type") or None)
+    took_ms = round((time.perf_counter() - started) * 1000, 3)
+    return jsonify({"status": "success", "query": query, "took_ms": took_ms, "results": results}), 200
+
+
+# ---------------------------------------
+# GET Endpoint: Inventory drift change log
+# ---------------------------------------
+@app.route("/api/assets-drift", methods=["GET"])
+def get_assets_drift():
+    """Return drift entries, optionally filtered by ?since=<ISO timestamp>&region=<region>."""
+    since = request.args.get("since")
+    region = request.args.get("region", "").strip().lower()
+    try:
+        since_dt = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        return jsonify({"status": "error", "message": f"Invalid since timestamp '{since}'"}), 400
+    if since_dt and since_dt.tzinfo:
+        # Drift entries are stored in server local time
+        since_dt = since_dt.astimezone().replace(tzinfo=None)
+
+    entries = []
+    if os.path.isdir(SAVE_PATH_DRIFT):
+        for name in sorted(os.listdir(SAVE_PATH_DRIFT)):
+            if not name.endswith("_drift.jsonl"):
+                continue
+            if region and name != f"{region}_drift.jsonl":
+                continue
+            with open(os.path.join(SAVE_PATH_DRIFT, name), "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if since_dt and datetime.fromisoformat(entry["timestamp"]) <= since_dt:
+                        continue
+                    entries.append(entry)
+
+    entries.sort(key=lambda e: e["timestamp"])
+    return jsonify({"status": "success", "entries": entries}), 200
+
+
 # ---------------------------------------
 # Main entry point
 # ---------------------------------------
@@ -221,6 +1185,12 @@ if __name__ == "__main__":
     os.makedirs(SAVE_PATH_VALIDATION_LOGS_DR, exist_ok=True)
     os.makedirs(SAVE_PATH_VALIDATION_LOGS_DR_FO, exist_ok=True)
     os.makedirs(SAVE_PATH_VALIDATION_LOGS_DR_FO_MS, exist_ok=True)
+    os.makedirs(SAVE_PATH_DRIFT, exist_ok=True)
+    os.makedirs(SAVE_PATH_COST_HISTORY, exist_ok=True)
+    os.makedirs(SAVE_PATH_COST_ANOMALIES, exist_ok=True)
+    os.makedirs(SAVE_PATH_LOG_SEGMENTS, exist_ok=True)
+    build_search_index()
+    threading.Thread(target=watch_backup_files, daemon=True).start()
     print(f"JSON listener started on port 5152...")
     print(f"Assets path: {SAVE_PATH_ASSETS}")
     print(f"Cost path: {SAVE_PATH_COST}")
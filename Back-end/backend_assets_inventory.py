@@ -6,7 +6,16 @@ This server provides API endpoints to read and update the assets_inventory.json
 
 Endpoints:
   GET  /api/assets-inventory-backup  - Get all backup data as a map keyed by IP
+       Optional query parameters:
+         fields=a,b     - only return the listed fields
+         ip=IP|CIDR,... - only return servers matching any IP or CIDR range
+         since=<seq>    - only return servers modified after change sequence <seq>
+       The current change sequence is returned in the X-Backup-Seq header.
   POST /api/assets-inventory-backup  - Update backup data for a specific IP
+       Each entry's "seq" is its version. Send it as an If-Match header or a
+       "version" field to make the update conditional; a stale version gets
+       HTTP 412 with the current entry. Edits to different IPs never block
+       each other.
 
 Usage:
   1. Install dependencies:
@@ -23,6 +32,8 @@ from flask import Flask, request, jsonify
 from flask_cors import CORS
 import os
 import json
+import ipaddress
+import threading
 from datetime import datetime
 
 app = Flask(__name__)
@@ -41,6 +52,22 @@ BACKUP_JSON_PATH = os.path.join(
 # Alternative: Use absolute path (uncomment and adjust if needed)
 # BACKUP_JSON_PATH = "/works/d_dilusha/app_assets_lib/AWS-Asset-Library/Front-end/public/data_backup/assets_inventory.json"
 
+# Editable per-server fields
+BACKUP_FIELDS = [
+    "asset_custodian",
+    "asset_owner",
+    "risk_owner",
+    "asset_classification",
+    "data_classification",
+]
+
+# In-memory copy of the backup file. Entries are committed under per-IP locks;
+# state_lock only guards short structural changes and snapshotting.
+backup_state = {"data": None, "index": {}, "mtime": None, "written_seq": 0}
+state_lock = threading.Lock()
+write_lock = threading.Lock()
+entry_locks = {}
+
 
 # ---------------------------------------
 # Helper: Read JSON file
@@ -78,12 +105,16 @@ def read_backup_json():
 # ---------------------------------------
 # Helper: Write JSON file
 # ---------------------------------------
-def write_backup_json(data):
-    """Write data to the backup JSON file."""
+def write_backup_json(payload):
+    """Atomically replace the backup JSON file with a serialized payload."""
+    tmp_path = f"{BACKUP_JSON_PATH}.tmp"
     try:
         os.makedirs(os.path.dirname(BACKUP_JSON_PATH), exist_ok=True)
-        with open(BACKUP_JSON_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        with state_lock:
+            os.replace(tmp_path, BACKUP_JSON_PATH)
+            backup_state["mtime"] = os.path.getmtime(BACKUP_JSON_PATH)
         print(f"[{datetime.now()}] Updated backup JSON: {BACKUP_JSON_PATH}")
         return True
     except Exception as e:
@@ -91,28 +122,137 @@ def write_backup_json(data):
         return False
 
 
+# ---------------------------------------
+# Helper: Cached backup state
+# ---------------------------------------
+def load_backup_state():
+    """Return the cached backup data, reloading it if the file changed on disk."""
+    with state_lock:
+        try:
+            mtime = os.path.getmtime(BACKUP_JSON_PATH)
+        except OSError:
+            mtime = None
+        if backup_state["data"] is None or mtime != backup_state["mtime"]:
+            data = read_backup_json()
+            backup_state["data"] = data
+            backup_state["index"] = {
+                str(server["ip"]).strip(): server
+                for server in data["servers"] if server and "ip" in server
+            }
+            backup_state["mtime"] = os.path.getmtime(BACKUP_JSON_PATH)
+            backup_state["written_seq"] = data.get("seq", 0)
+        return backup_state["data"]
+
+
+def get_entry_lock(ip):
+    with state_lock:
+        return entry_locks.setdefault(ip, threading.Lock())
+
+
+def persist_backup_state(data, seq):
+    """Write data unless a snapshot containing seq is already on disk.
+
+    Returns None if the cache was reloaded from disk after data was modified;
+    the caller must then re-apply its change to the reloaded state.
+    """
+    with write_lock:
+        with state_lock:
+            if backup_state["data"] is not data:
+                return None
+            if backup_state["written_seq"] >= seq:
+                return True
+            snapshot_seq = data.get("seq", 0)
+            payload = json.dumps(data, indent=4, ensure_ascii=False)
+        if not write_backup_json(payload):
+            # Drop the unsaved changes; the next request reloads what is on disk
+            with state_lock:
+                if backup_state["data"] is data:
+                    backup_state["data"] = None
+            return False
+        with state_lock:
+            if backup_state["data"] is data:
+                backup_state["written_seq"] = snapshot_seq
+        return True
+
+
+def parse_expected_version(body):
+    """Read the expected entry version from If-Match or the body; None means unconditional."""
+    value = request.headers.get("If-Match")
+    if value is None:
+        value = body.get("version")
+    if value is None or value == "*":
+        return value
+    value = str(value).strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    return int(value.strip('"'))
+
+
+# ---------------------------------------
+# Helper: Match an IP against a list of networks
+# ---------------------------------------
+def ip_matches(ip, networks):
+    """Return True if ip falls inside any of the given networks."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
 # ---------------------------------------
 # GET Endpoint: Get all backup data
 # ---------------------------------------
 @app.route("/api/assets-inventory-backup", methods=["GET"])
 def get_backup_data():
-    """Get all backup data as a map keyed by IP."""
+    """Get backup data as a map keyed by IP, with optional projection and filters."""
     try:
-        data = read_backup_json()
+        fields = BACKUP_FIELDS
+        if request.args.get("fields"):
+            fields = [f.strip() for f in request.args["fields"].split(",") if f.strip()]
+            unknown = [f for f in fields if f not in BACKUP_FIELDS and f != "seq"]
+            if unknown:
+                return jsonify({"error": f"Unknown fields: {', '.join(unknown)}"}), 400
+
+        networks = []
+        if request.args.get("ip"):
+            try:
+                networks = [
+                    ipaddress.ip_network(value.strip(), strict=False)
+                    for value in request.args["ip"].split(",") if value.strip()
+                ]
+            except ValueError as e:
+                return jsonify({"error": f"Invalid ip filter: {e}"}), 400
+
+        since = None
+        if request.args.get("since"):
+            try:
+                since = int(request.args["since"])
+            except ValueError:
+                return jsonify({"error": "since must be an integer change sequence"}), 400
+
+        data = load_backup_state()
+        with state_lock:
+            servers = [dict(server) for server in data["servers"] if server]
+            current_seq = data.get("seq", 0)
         ip_map = {}
         
-        for server in data.get("servers", []):
+        for server in servers:
             if server and "ip" in server:
                 ip_key = str(server["ip"]).strip()
-                ip_map[ip_key] = {
-                    "asset_custodian": server.get("asset_custodian", ""),
-                    "asset_owner": server.get("asset_owner", ""),
-                    "risk_owner": server.get("risk_owner", ""),
-                    "asset_classification": server.get("asset_classification", ""),
-                    "data_classification": server.get("data_classification", ""),
-                }
+                seq = server.get("seq", 0)
+                if since is not None and seq <= since:
+                    continue
+                if networks and not ip_matches(ip_key, networks):
+                    continue
+                entry = {field: server.get(field, "") for field in fields if field != "seq"}
+                if not request.args.get("fields") or "seq" in fields:
+                    entry["seq"] = seq
+                ip_map[ip_key] = entry
         
-        return jsonify(ip_map), 200
+        response = jsonify(ip_map)
+        response.headers["X-Backup-Seq"] = str(current_seq)
+        return response, 200
     except Exception as e:
         print(f"[{datetime.now()}] Error in GET /api/assets-inventory-backup: {e}")
         return jsonify({"error": str(e)}), 500
@@ -138,49 +278,72 @@ def update_backup_data():
         
         ip = str(ip).strip()
         
-        # Allowed fields
-        allowed_fields = [
-            "asset_custodian",
-            "asset_owner",
-            "risk_owner",
-            "asset_classification",
-            "data_classification"
-        ]
-        
-        # Read current data
-        data = read_backup_json()
-        servers = data.get("servers", [])
-        
-        # Find existing server entry
-        server_index = None
-        for i, server in enumerate(servers):
-            if server and str(server.get("ip", "")).strip() == ip:
-                server_index = i
-                break
+        try:
+            expected = parse_expected_version(body)
+        except ValueError:
+            return jsonify({"ok": False, "error": "Version must be an integer"}), 400
         
         # Prepare updates (only allowed fields)
         updates = {}
-        for field in allowed_fields:
+        for field in BACKUP_FIELDS:
             if field in values:
                 updates[field] = values[field]
         
-        # Update or create server entry
-        if server_index is not None:
-            # Update existing entry
-            servers[server_index].update(updates)
-            servers[server_index]["ip"] = ip  # Ensure IP is set
-            print(f"[{datetime.now()}] Updated entry for IP: {ip}")
-        else:
-            # Create new entry
-            new_entry = {"ip": ip}
-            new_entry.update(updates)
-            servers.append(new_entry)
-            print(f"[{datetime.now()}] Created new entry for IP: {ip}")
+        with get_entry_lock(ip):
+            while True:
+                # Read data and index together so a concurrent reload can't split them
+                load_backup_state()
+                with state_lock:
+                    data = backup_state["data"]
+                    server = backup_state["index"].get(ip)
+                    current = server.get("seq", 0) if server else 0
+                if expected == "*" and server is None:
+                    print(f"[{datetime.now()}] Conditional update for missing IP {ip}")
+                    return jsonify({
+                        "ok": False,
+                        "error": f"No entry exists for IP {ip}",
+                        "version": 0,
+                        "current": None,
+                    }), 412
+                if expected not in (None, "*") and expected != current:
+                    print(f"[{datetime.now()}] Version conflict for IP {ip}: expected {expected}, current {current}")
+                    return jsonify({
+                        "ok": False,
+                        "error": f"Entry for IP {ip} was modified by someone else",
+                        "version": current,
+                        "current": dict(server) if server else None,
+                    }), 412
+                
+                if server is not None and all(server.get(field) == value for field, value in updates.items()):
+                    return jsonify({"ok": True, "message": f"No changes for IP {ip}", "seq": current}), 200
+                
+                # Update or create server entry, stamped with the next change sequence
+                with state_lock:
+                    if backup_state["data"] is not data:
+                        continue  # Reloaded from disk meanwhile; re-check against the new state
+                    data["seq"] = data.get("seq", 0) + 1
+                    seq = data["seq"]
+                    if server is None:
+                        server = {"ip": ip}
+                        data["servers"].append(server)
+                        backup_state["index"][ip] = server
+                        print(f"[{datetime.now()}] Created new entry for IP: {ip}")
+                    else:
+                        print(f"[{datetime.now()}] Updated entry for IP: {ip}")
+                    server.update(updates)
+                    server["ip"] = ip  # Ensure IP is set
+                    server["seq"] = seq
+                
+                # Save updated data
+                persisted = persist_backup_state(data, seq)
+                if persisted is not None:
+                    break
+                print(f"[{datetime.now()}] Backup file reloaded before IP {ip} was saved; retrying")
         
-        # Save updated data
-        data["servers"] = servers
-        if write_backup_json(data):
-            return jsonify({"ok": True, "message": f"Data updated for IP {ip}"}), 200
+        if persisted:
+            response = jsonify({"ok": True, "message": f"Data updated for IP {ip}", "seq": seq})
+            response.headers["ETag"] = f'"{seq}"'
+            return response, 200
         else:
             return jsonify({"ok": False, "error": "Failed to write backup file"}), 500
             
@@ -200,9 +200,16 @@ export default function EdbOsVersions({ onBack }) {
       const res = await fetch('/api/edb-os-backup', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ ip, values }),
+        // Send the entry version so concurrent edits are rejected instead of overwritten
+        body: JSON.stringify({ ip, values, version: persistedMap[ip]?.seq }),
       });
       
+      if (res.status === 412) {
+        const conflict = await res.json();
+        setPersistedMap(prev => ({ ...prev, [ip]: conflict.current || {} }));
+        throw new Error(conflict.error || 'Entry was modified by someone else');
+      }
+
       if (!res.ok) {
         throw new Error(`HTTP ${res.status}`);
       }
@@ -215,6 +222,7 @@ export default function EdbOsVersions({ onBack }) {
         [ip]: {
           ...(prev[ip] || {}),
           ...values,
+          seq: result.seq,
         },
       }));
       } else {
@@ -14,6 +14,22 @@ export default defineConfig({
         target: 'http://localhost:5154',
         changeOrigin: true,
       },
+      '/api/assets-drift': {
+        target: 'http://localhost:5152',
+        changeOrigin: true,
+      },
+      '/api/search': {
+        target: 'http://localhost:5152',
+        changeOrigin: true,
+      },
+      '/api/cost-anomalies': {
+        target: 'http://localhost:5152',
+        changeOrigin: true,
+      },
+      '/api/export': {
+        target: 'http://localhost:5152',
+        changeOrigin: true,
+      },
     },
   },
 })